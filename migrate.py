@@ -25,70 +25,170 @@ __version__ = "1.1.0"
 
 import argparse
 import csv
+import functools
 import logging
 import os
+import queue
+import random
+import re
+import shutil
 import sys
+import threading
 import urllib.parse
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from mimetypes import MimeTypes
 from pathlib import Path
-from time import perf_counter
-from typing import Dict, Optional
+from time import perf_counter, sleep
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
 import gridfs
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import AutoReconnect, BulkWriteError
 from tqdm import tqdm
 
+MAX_BSON_BATCH_BYTES = 16 * 1024 * 1024
+MIN_CURSOR_BATCH_SIZE = 101
+MAX_CURSOR_BATCH_SIZE = 10000
+BULK_BATCH_SIZE = 1000
+LOG_FLUSH_EVERY = 10000
+MONGO_RETRIES = 5
+UPLOAD_FILTER = {"store": "GridFS:Uploads", "complete": True}
+UPLOAD_FIELDS = ("_id", "extension")
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+URI_SAFE_CHARS = "~@#$&()*!+=:;,.?/'"
+
+# Names made only of characters quote() leaves untouched skip quoting entirely.
+_URI_SAFE_RE = re.compile(r"[A-Za-z0-9_.\-" + re.escape(URI_SAFE_CHARS) + "]*")
+_quote_uri = functools.partial(urllib.parse.quote, safe=URI_SAFE_CHARS)
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
+def with_retries(operation: Callable, *args, **kwargs):
+    """Run a MongoDB operation, retrying transient network errors with jittered backoff."""
+    for attempt in range(MONGO_RETRIES):
+        try:
+            return operation(*args, **kwargs)
+        except AutoReconnect as e:
+            if attempt == MONGO_RETRIES - 1:
+                raise
+            delay = min(30, 2 ** attempt + random.random())
+            logger.warning("Transient MongoDB error, retrying in %.1fs: %s", delay, e)
+            sleep(delay)
+
+class FilenameTable(dict):
+    """str.translate table keeping alphanumerics and " .-_%", filled on first use."""
+
+    ALLOWED = " .-_%"
+
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        char = chr(codepoint)
+        value = codepoint if char.isalnum() or char in self.ALLOWED else None
+        self[codepoint] = value
+        return value
+
 class FileSystemStore:
+    # Upload fields put() reads beyond those dumpfiles always projects.
+    FIELDS = ()
+    _TRANSLATE = FilenameTable()
+
     def __init__(self, migrator, directory: str):
         self.migrator = migrator
         self.outDir = Path(directory)
         self.outDir.mkdir(parents=True, exist_ok=True)
         logger.info(f"Initialized FileSystemStore with directory: {self.outDir}")
 
-    def put(self, filename: str, data: bytes, entry: Dict) -> str:
+    def put(self, filename: str, body: BinaryIO, entry: Dict) -> str:
         # Improved filename sanitization
-        safe_filename = "".join(c for c in filename if c.isalnum() or c in " .-_%").rstrip()
+        safe_filename = filename.translate(self._TRANSLATE).rstrip()
         file_path = self.outDir / safe_filename
         try:
-            with open(file_path, "wb") as file:
-                file.write(data)
-            logger.debug(f"Saved file: {safe_filename}")
+            with open(file_path, "wb", buffering=COPY_BUFFER_SIZE) as file:
+                shutil.copyfileobj(body, file, COPY_BUFFER_SIZE)
+            logger.debug("Saved file: %s", safe_filename)
             return str(file_path)
         except Exception as e:
-            logger.error(f"Failed to save file {safe_filename}: {e}")
+            logger.error("Failed to save file %s: %s", safe_filename, e)
+            # Don't leave a truncated copy behind for a failed read or write.
+            file_path.unlink(missing_ok=True)
             return ""
 
+    def close(self):
+        pass
+
 class AmazonS3Store:
-    def __init__(self, migrator, bucket: str):
+    FIELDS = ("rid", "userId", "name", "type")
+
+    def __init__(self, migrator, bucket: str, part_concurrency: int = 8):
         self.migrator = migrator
         self.bucket = bucket
         import boto3
-        self.s3 = boto3.resource("s3")
-        self.uniqueID = migrator.uniqueid()
+        from boto3.s3.transfer import TransferConfig, TransferManager
+        from botocore.config import Config
+        # Each worker thread has its own transfer manager with part_concurrency
+        # request slots; size the shared pool so none of those connections are
+        # discarded and re-opened.
+        self.s3 = boto3.resource(
+            "s3",
+            config=Config(
+                retries={"max_attempts": 10, "mode": "adaptive"},
+                max_pool_connections=migrator.max_workers * part_concurrency,
+            ),
+        )
+        self._transfer_manager = TransferManager
+        self.transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=16 * 1024 * 1024,
+            max_concurrency=part_concurrency,
+            use_threads=True,
+        )
+        # One manager per worker thread, so each file gets its own part_concurrency
+        # request slots instead of all workers sharing one pool.
+        self._local = threading.local()
+        self._transfers = []
+        self._transfers_lock = threading.Lock()
+        self.uniqueID = migrator.uniqueid
         logger.info(f"Initialized AmazonS3Store with bucket: {self.bucket}")
 
     def encodeURI(self, string: str) -> str:
-        return urllib.parse.quote(string, safe="~@#$&()*!+=:;,.?/'")
-
-    def put(self, filename: str, data: bytes, entry: Dict) -> str:
+        if _URI_SAFE_RE.fullmatch(string):
+            return string
+        return _quote_uri(string)
+
+    @property
+    def transfer(self):
+        transfer = getattr(self._local, "transfer", None)
+        if transfer is None:
+            transfer = self._transfer_manager(self.s3.meta.client, self.transfer_config)
+            self._local.transfer = transfer
+            with self._transfers_lock:
+                self._transfers.append(transfer)
+        return transfer
+
+    def put(self, filename: str, body: BinaryIO, entry: Dict) -> str:
         key = f"{self.uniqueID}/Uploads/{entry['rid']}/{entry['userId']}/{entry['_id']}"
         try:
-            obj = self.s3.Object(self.bucket, key)
-            params = {
-                "Body": data,
+            extra_args = {
                 "ContentDisposition": f'inline; filename="{self.encodeURI(entry["name"])}"',
             }
             if "type" in entry:
-                params["ContentType"] = entry["type"]
-            obj.put(**params)
-            logger.debug(f"Uploaded to S3: {key}")
+                extra_args["ContentType"] = entry["type"]
+            self.transfer.upload(body, self.bucket, key, extra_args=extra_args).result()
+            logger.debug("Uploaded to S3: %s", key)
             return key
         except Exception as e:
-            logger.error(f"Failed to upload {key} to S3: {e}")
+            logger.error("Failed to upload %s to S3: %s", key, e)
             return ""
 
+    def close(self):
+        with self._transfers_lock:
+            for transfer in self._transfers:
+                transfer.shutdown()
+            self._transfers.clear()
+
 class Migrator:
     def __init__(
         self,
@@ -99,6 +199,7 @@ class Migrator:
         port: int = 27017,
         logfile: Optional[str] = None,
         max_workers: int = 4,
+        cursor_batch_size: Optional[int] = None,
     ):
         self.logfile = Path(logfile) if logfile else None
         self.log = []
@@ -108,83 +209,190 @@ class Migrator:
         self.password = password
         self.port = port
         self.max_workers = max_workers
+        self.cursor_batch_size = cursor_batch_size
+        self._client = self._connect()
+        self._collections: Dict[str, Collection] = {}
         logger.info(
             f"Initialized Migrator: db={db}, host={host}, port={port}, logfile={logfile}"
         )
 
-    def getdb(self):
+    def _connect(self) -> MongoClient:
         try:
             client_args = {
                 "host": self.host,
                 "port": self.port,
                 "retryWrites": False,
+                "maxPoolSize": max(100, 2 * self.max_workers),
+                "minPoolSize": self.max_workers,
+                "maxIdleTimeMS": 300000,
             }
             if self.username is not None and self.password is not None:
                 client_args["username"] = self.username
                 client_args["password"] = self.password
-            client = MongoClient(**client_args)
-            return client[self.db]
+            return MongoClient(**client_args)
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
 
-    def _process_upload(self, upload: Dict, fs: gridfs.GridFSBucket, store, mime: MimeTypes, collection: str) -> Optional[Dict]:
-        if upload.get("store") != "GridFS:Uploads":
-            logger.debug(f"Skipping non-GridFS upload: {upload['_id']}")
-            return None
+    def getdb(self):
+        return self._client[self.db]
+
+    def _collection(self, name: str) -> Collection:
+        # Reuse Collection handles across batches instead of rebuilding one per lookup.
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = self.getdb()[name]
+        return collection
+
+    def _batch_size(self, db, collection: str) -> int:
+        if self.cursor_batch_size is not None:
+            return self.cursor_batch_size
+        # Size each getMore to fill the server's 16 MiB reply cap.
+        try:
+            stats = next(
+                db[collection].aggregate([{"$collStats": {"storageStats": {}}}]), {}
+            )
+            avg_obj_size = stats.get("storageStats", {}).get("avgObjSize", 0)
+        except Exception as e:
+            logger.warning(f"Failed to read stats for {collection}: {e}")
+            avg_obj_size = 0
+        if not avg_obj_size:
+            return MIN_CURSOR_BATCH_SIZE
+        return max(
+            MIN_CURSOR_BATCH_SIZE,
+            min(MAX_BSON_BATCH_BYTES // avg_obj_size, MAX_CURSOR_BATCH_SIZE),
+        )
+
+    def _process_upload(self, upload: Dict, fs: gridfs.GridFSBucket, store, collection: str) -> Optional[Dict]:
+        # dumpfiles only selects complete GridFS uploads (UPLOAD_FILTER).
         gridfsId = upload["_id"]
-        if upload.get("complete", False):
-            try:
-                with fs.find({"_id": gridfsId}) as cursor:
-                    for res in cursor:
-                        data = res.read()
-                        filename = gridfsId
-                        if upload.get("extension"):
-                            filename += f".{upload['extension']}"
-                        key = store.put(filename, data, upload)
-                        return {
-                            "id": gridfsId,
-                            "file": filename,
-                            "collection": collection,  # Use collection name instead of fs.bucket_name
-                            "key": key,
-                        }
-            except Exception as e:
-                logger.error(f"Error processing upload {gridfsId}: {e}")
+        extension = upload.get("extension")
+        filename = f"{gridfsId}.{extension}" if extension else gridfsId
+        try:
+            with fs.open_download_stream(gridfsId) as grid_out:
+                key = store.put(filename, grid_out, upload)
+            if not key:
                 return None
-        else:
-            logger.warning(f"Skipping incomplete upload: {gridfsId}")
+            return {
+                "id": gridfsId,
+                "file": filename,
+                "collection": collection,  # Use collection name instead of fs.bucket_name
+                "key": key,
+            }
+        except Exception as e:
+            logger.error("Error processing upload %s: %s", gridfsId, e)
             return None
 
+    def _produce(self, items, work_queue: queue.Queue, result_queue: queue.Queue):
+        # Blocks on the bounded queue, so the source (a cursor or a CSV
+        # reader) only advances as fast as the workers drain it.
+        try:
+            for item in items:
+                work_queue.put(item)
+        except Exception as e:
+            logger.error(f"Failed to read work items: {e}")
+            # Handed to _run_workers, which re-raises once the workers are done.
+            result_queue.put(e)
+        finally:
+            items.close()
+            for _ in range(self.max_workers):
+                work_queue.put(None)
+
+    def _consume(self, work_queue: queue.Queue, result_queue: queue.Queue, handler: Callable):
+        try:
+            while True:
+                item = work_queue.get()
+                if item is None:
+                    return
+                try:
+                    result = handler(item)
+                except Exception as e:
+                    logger.error("Worker failed: %s", e)
+                    result = None
+                result_queue.put((item, result))
+        finally:
+            result_queue.put(None)
+
+    def _run_workers(self, items, handler: Callable) -> Iterator[Tuple]:
+        """Apply handler to items on max_workers threads, yielding (item, result) pairs."""
+        work_queue = queue.Queue(maxsize=2 * self.max_workers)
+        result_queue = queue.Queue()
+        threads = [
+            threading.Thread(
+                target=self._produce, args=(items, work_queue, result_queue), daemon=True
+            )
+        ]
+        threads += [
+            threading.Thread(
+                target=self._consume, args=(work_queue, result_queue, handler), daemon=True
+            )
+            for _ in range(self.max_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        error = None
+        finished_workers = 0
+        while finished_workers < self.max_workers:
+            item = result_queue.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            if isinstance(item, Exception):
+                error = item
+                continue
+            yield item
+
+        for thread in threads:
+            thread.join()
+        if error is not None:
+            raise error
+
     def dumpfiles(self, collection: str, store):
         start_time = perf_counter()
-        mime = MimeTypes()
         db = self.getdb()
         uploads_collection = db[collection]
         fs = gridfs.GridFSBucket(db, bucket_name=collection)
 
-        uploads = uploads_collection.find({}, no_cursor_timeout=True).batch_size(50)
-        total = uploads_collection.count_documents({})
+        batch_size = self._batch_size(db, collection)
+        projection = dict.fromkeys(UPLOAD_FIELDS + store.FIELDS, 1)
+        uploads = uploads_collection.find(
+            UPLOAD_FILTER, projection, no_cursor_timeout=True
+        ).batch_size(batch_size)
+        total = uploads_collection.count_documents(UPLOAD_FILTER)
+        # Metadata-based estimate, so reporting skipped uploads costs no extra scan.
+        skipped = uploads_collection.estimated_document_count() - total
+        if skipped > 0:
+            logger.warning(f"Skipping about {skipped} uploads that are incomplete or not stored in GridFS")
         failed_uploads = []
 
-        logger.info(f"Starting dump of {total} files from collection: {collection}")
-
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = []
-            for upload in uploads:
-                futures.append(
-                    executor.submit(self._process_upload, upload, fs, store, mime, collection)
-                )
-
-            processed = 0
-            for future in tqdm(as_completed(futures), total=total, desc="Dumping files"):
-                result = future.result()
-                if result:
-                    self.addtolog(result)
-                    processed += 1
-                else:
-                    failed_uploads.append(upload["_id"])
+        logger.info(
+            f"Starting dump of {total} files from collection: {collection} (cursor batch size: {batch_size})"
+        )
 
-        self.writelog()
+        processed = 0
+        try:
+            with tqdm(
+                total=total,
+                desc="Dumping files",
+                mininterval=0.5,
+                miniters=max(1, total // 1000),
+                smoothing=0,
+            ) as progress:
+                for upload, result in self._run_workers(
+                    uploads, lambda upload: self._process_upload(upload, fs, store, collection)
+                ):
+                    progress.update(1)
+                    if result:
+                        self.addtolog(result)
+                        processed += 1
+                        if len(self.log) >= LOG_FLUSH_EVERY:
+                            self.writelog()
+                    else:
+                        failed_uploads.append(upload["_id"])
+        finally:
+            # Record every file already copied, even if the cursor failed mid-run.
+            self.writelog()
         duration = perf_counter() - start_time
         logger.info(f"Dumped {processed}/{total} files in {duration:.2f} seconds")
         if failed_uploads:
@@ -197,87 +405,112 @@ class Migrator:
         try:
             with open(self.logfile, "a", newline="") as file:
                 writer = csv.writer(file)
-                for entry in self.log:
-                    writer.writerow(
-                        [entry["id"], entry["file"], entry["collection"], entry["key"]]
-                    )
+                writer.writerows(
+                    (entry["id"], entry["file"], entry["collection"], entry["key"])
+                    for entry in self.log
+                )
             logger.info(f"Wrote {len(self.log)} entries to log file: {self.logfile}")
             self.log.clear()
         except Exception as e:
             logger.error(f"Failed to write log file: {e}")
 
+    @functools.cached_property
     def uniqueid(self) -> str:
-        db = self.getdb()
-        row = db.rocketchat_settings.find_one({"_id": "uniqueID"})
+        row = self._collection("rocketchat_settings").find_one({"_id": "uniqueID"})
         if not row:
             logger.error("UniqueID not found in database")
             raise ValueError("UniqueID not found")
         return row["value"]
 
-    def _update_record(self, row: list, db, target: str):
+    def _read_log_batches(self, make_item: Callable) -> Iterator[Tuple[str, list]]:
+        """Stream the CSV log, yielding (collection, items) batches of up to BULK_BATCH_SIZE."""
+        # Opened eagerly so a missing log fails here instead of inside the worker pool.
+        csvfile = open(self.logfile, newline="")
+        return self._batch_log_rows(csvfile, make_item)
+
+    def _batch_log_rows(self, csvfile, make_item: Callable) -> Iterator[Tuple[str, list]]:
+        pending: Dict[str, list] = {}
+        with csvfile:
+            for row in csv.reader(csvfile):
+                if len(row) != 4:
+                    logger.error("Skipping malformed log row: %s", row)
+                    continue
+                batch = pending.setdefault(row[2], [])
+                batch.append(make_item(row))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    yield row[2], pending.pop(row[2])
+        for collectionName, batch in pending.items():
+            yield collectionName, batch
+
+    def _update_op(self, row: list, target: str) -> UpdateOne:
+        dbId, filename, _, key = row
+        update_data = {
+            "store": f"{target}:Uploads",
+            "path": f"/ufs/{target}:Uploads/{dbId}/{filename}",
+            "url": f"/ufs/{target}:Uploads/{dbId}/{filename}",
+        }
+        if target == "AmazonS3":
+            update_data["AmazonS3"] = {"path": key}
+        return UpdateOne({"_id": dbId}, {"$set": update_data})
+
+    def _update_batch(self, collection: Collection, ops: List[UpdateOne]) -> int:
         try:
-            dbId, filename, collectionName, key = row
-            collection = db[collectionName]
-            update_data = {
-                "store": f"{target}:Uploads",
-                "path": f"/ufs/{target}:Uploads/{dbId}/{filename}",
-                "url": f"/ufs/{target}:Uploads/{dbId}/{filename}",
-            }
-            if target == "AmazonS3":
-                update_data["AmazonS3"] = {"path": key}
-            collection.update_one({"_id": dbId}, {"$set": update_data})
-            return dbId, True
+            result = with_retries(collection.bulk_write, ops, ordered=False)
+            logger.debug("Updated %d/%d records in %s", result.modified_count, len(ops), collection.name)
+            return result.modified_count
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            logger.error("Failed to update %d/%d records in %s: %s", len(errors), len(ops), collection.name, errors)
+            return e.details.get("nModified", 0)
         except Exception as e:
-            logger.error(f"Failed to update record {dbId}: {e}")
-            return dbId, False
+            logger.error("Failed to update %d records in %s: %s", len(ops), collection.name, e)
+            return 0
 
     def updateDb(self, target: str):
         start_time = perf_counter()
-        db = self.getdb()
-        with open(self.logfile, newline="") as csvfile:
-            reader = list(csv.reader(csvfile))
-            total = len(reader)
-            logger.info(f"Updating {total} database records for target: {target}")
-
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [
-                    executor.submit(self._update_record, row, db, target)
-                    for row in reader
-                ]
-                updated = 0
-                for future in tqdm(as_completed(futures), total=total, desc="Updating DB"):
-                    dbId, success = future.result()
-                    if success:
-                        updated += 1
+        logger.info(f"Updating database records from {self.logfile} for target: {target}")
+
+        batches = self._read_log_batches(lambda row: self._update_op(row, target))
+        total = 0
+        updated = 0
+        with tqdm(desc="Updating DB", unit="records", mininterval=0.5, smoothing=0) as progress:
+            for (collectionName, ops), count in self._run_workers(
+                batches, lambda batch: self._update_batch(self._collection(batch[0]), batch[1])
+            ):
+                total += len(ops)
+                updated += count or 0
+                progress.update(len(ops))
 
         duration = perf_counter() - start_time
         logger.info(f"Updated {updated}/{total} records in {duration:.2f} seconds")
 
-    def _remove_blob(self, row: list, db):
+    def _remove_batch(self, collectionName: str, ids: List[str]) -> int:
         try:
-            dbId, _, collectionName, _ = row
-            fs = gridfs.GridFSBucket(db, bucket_name=collectionName)
-            fs.delete(dbId)
-            return dbId, True
+            files = self._collection(f"{collectionName}.files")
+            chunks = self._collection(f"{collectionName}.chunks")
+            deleted = with_retries(files.delete_many, {"_id": {"$in": ids}}).deleted_count
+            with_retries(chunks.delete_many, {"files_id": {"$in": ids}})
+            if deleted != len(ids):
+                logger.warning("Removed %d/%d blobs from %s, the rest were not found", deleted, len(ids), collectionName)
+            return deleted
         except Exception as e:
-            logger.warning(f"Failed to remove blob {dbId}: {e}")
-            return dbId, False
+            logger.warning("Failed to remove %d blobs from %s: %s", len(ids), collectionName, e)
+            return 0
 
     def removeBlobs(self):
         start_time = perf_counter()
-        db = self.getdb()
-        with open(self.logfile, newline="") as csvfile:
-            reader = list(csv.reader(csvfile))
-            total = len(reader)
-            logger.info(f"Removing {total} blobs")
-
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [executor.submit(self._remove_blob, row, db) for row in reader]
-                removed = 0
-                for future in tqdm(as_completed(futures), total=total, desc="Removing blobs"):
-                    dbId, success = future.result()
-                    if success:
-                        removed += 1
+        logger.info(f"Removing blobs listed in {self.logfile}")
+
+        batches = self._read_log_batches(lambda row: row[0])
+        total = 0
+        removed = 0
+        with tqdm(desc="Removing blobs", unit="blobs", mininterval=0.5, smoothing=0) as progress:
+            for (collectionName, ids), count in self._run_workers(
+                batches, lambda batch: self._remove_batch(batch[0], batch[1])
+            ):
+                total += len(ids)
+                removed += count or 0
+                progress.update(len(ids))
 
         duration = perf_counter() - start_time
         logger.info(f"Removed {removed}/{total} blobs in {duration:.2f} seconds")
@@ -313,7 +546,19 @@ if __name__ == "__main__":
     parser.add_argument("--user", default=None, help="MongoDB username (default: %(default)s)")
     parser.add_argument("--password", default=None, help="MongoDB password (default: %(default)s)")
     parser.add_argument(
-        "--max-workers", type=int, default=4, help="Number of parallel workers (default: %(default)s)"
+        "--max-workers", type=positive_int, default=4, help="Number of parallel workers (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--part-concurrency",
+        type=positive_int,
+        default=8,
+        help="Multipart parts uploaded in parallel per S3 file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cursor-batch-size",
+        type=positive_int,
+        default=None,
+        help="Documents per MongoDB cursor batch (default: derived from average document size)",
     )
 
     args = parser.parse_args()
@@ -342,16 +587,20 @@ if __name__ == "__main__":
         port=args.port,
         logfile=args.log_file,
         max_workers=args.max_workers,
+        cursor_batch_size=args.cursor_batch_size,
     )
 
     if args.command == "dump":
         if args.target == "AmazonS3":
-            store = AmazonS3Store(obj, args.destination)
+            store = AmazonS3Store(obj, args.destination, args.part_concurrency)
         else:
             if not Path(args.destination).is_dir():
                 parser.error(f"Destination directory does not exist: {args.destination}")
             store = FileSystemStore(obj, args.destination)
-        obj.dumpfiles("rocketchat_uploads", store)
+        try:
+            obj.dumpfiles("rocketchat_uploads", store)
+        finally:
+            store.close()
     elif args.command == "updatedb":
         obj.updateDb(args.target)
     elif args.command == "removeblobs":